@@ -16,9 +16,7 @@ import csv
 import argparse
 
 
-def _model():
-    input_shape = (128, 128)
-
+def _model(input_shape=(128, 128, 1)):
     use_adadelta = True,
     learning_rate = 0.01
     W_l2 = 0.0001
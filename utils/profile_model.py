@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+import os
+
+# Profile on CPU only, the model has to fit a real-time CPU budget
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+from keras import backend as K
+from keras.models import Sequential
+from keras.layers import Dense, Flatten, InputLayer, Reshape
+from keras.layers.convolutional import Conv2D, MaxPooling2D
+
+from model import model, _model
+
+import argparse
+import json
+import sys
+import time
+import numpy as np
+
+
+ARCHITECTURES = {
+    'model': lambda shape: model(shape),
+    '_model': lambda shape: _model(shape),
+}
+
+DEFAULT_SHAPE = (128, 128, 1)
+
+BYTES_PER_FLOAT = 4
+
+
+def build(arch, shape):
+    K.clear_session()
+    K.set_learning_phase(0)
+
+    if arch in ARCHITECTURES:
+        return ARCHITECTURES[arch](shape or DEFAULT_SHAPE)
+
+    if os.path.isfile(arch):
+        net = model(None, arch)
+        if not isinstance(net, Sequential):
+            raise ValueError('saved model {} is not a Sequential model'.format(arch))
+        if shape and tuple(net.input_shape[1:]) != tuple(shape):
+            raise ValueError('--shape {} does not match input shape {} of saved model {}'
+                             .format(tuple(shape), tuple(net.input_shape[1:]), arch))
+        return net
+
+    raise ValueError('unknown architecture {!r}, expected one of {} or a saved model file'
+                     .format(arch, ', '.join(sorted(ARCHITECTURES))))
+
+
+def _elements(shape):
+    return int(np.prod([d for d in shape if d is not None]))
+
+
+def layer_flops(layer):
+    # Multiply-add counted as 2 FLOPs, single sample
+    out_shape = layer.output_shape
+
+    if isinstance(layer, Conv2D):
+        kh, kw = layer.kernel_size
+        cin = layer.input_shape[-1]
+        flops = 2 * kh * kw * cin * _elements(out_shape)
+        if layer.use_bias:
+            flops += _elements(out_shape)
+        return flops
+
+    if isinstance(layer, Dense):
+        flops = 2 * layer.input_shape[-1] * layer.units
+        if layer.use_bias:
+            flops += layer.units
+        return flops
+
+    if isinstance(layer, MaxPooling2D):
+        ph, pw = layer.pool_size
+        return ph * pw * _elements(out_shape)
+
+    return 0
+
+
+def _time(fn, repeats, warmup):
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return float(np.median(times))
+
+
+def _call_overhead(x, out_shape, repeats, warmup):
+    # Fixed cost of a session run: feeding the input and fetching an output-sized tensor
+    inp = K.placeholder(shape=x.shape)
+    out = K.variable(np.zeros(out_shape, dtype=np.float32))
+    identity = K.function([inp], [out])
+    return _time(lambda: identity([x]), repeats, warmup)
+
+
+def _activation_bytes(layer, batch_size):
+    # Layers passing their input through or reshaping it in place allocate nothing
+    if layer.output is layer.input or isinstance(layer, (Flatten, Reshape)):
+        return 0
+    return _elements(layer.output_shape) * batch_size * BYTES_PER_FLOAT
+
+
+def profile_layers(net, batch_size, repeats, warmup):
+    x = np.random.uniform(-.5, .5, (batch_size,) + net.input_shape[1:]).astype(np.float32)
+
+    overheads = {}
+    layers = []
+    for layer in net.layers:
+        if isinstance(layer, InputLayer):
+            continue
+
+        out_shape = (batch_size,) + layer.output_shape[1:]
+        key = (x.shape, out_shape)
+        if key not in overheads:
+            overheads[key] = _call_overhead(x, out_shape, repeats, warmup)
+
+        forward = K.function([layer.input], [layer.output])
+        latency = _time(lambda: forward([x]), repeats, warmup) - overheads[key]
+        y = forward([x])[0]
+
+        layers.append({
+            'name': layer.name,
+            'type': layer.__class__.__name__,
+            'output_shape': list(layer.output_shape[1:]),
+            'params': layer.count_params(),
+            'flops': layer_flops(layer) * batch_size,
+            'activation_bytes': _activation_bytes(layer, batch_size),
+            'latency_ms': latency * 1000,
+            'overhead_ms': overheads[key] * 1000,
+        })
+
+        x = y
+
+    return layers
+
+
+def profile_throughput(net, batch_sizes, repeats, warmup):
+    results = []
+    for batch_size in batch_sizes:
+        x = np.random.uniform(-.5, .5, (batch_size,) + net.input_shape[1:]).astype(np.float32)
+        latency = _time(lambda: net.predict_on_batch(x), repeats, warmup)
+
+        results.append({
+            'batch_size': batch_size,
+            'latency_ms': latency * 1000,
+            'samples_per_s': batch_size / latency,
+        })
+
+    return results
+
+
+def profile(arch, net, batch_size, batch_sizes, repeats, warmup):
+    layers = profile_layers(net, batch_size, repeats, warmup)
+    throughput = profile_throughput(net, batch_sizes, repeats, warmup)
+
+    forward = [t for t in throughput if t['batch_size'] == batch_size]
+    forward = forward[0] if forward else profile_throughput(net, [batch_size], repeats, warmup)[0]
+
+    return {
+        'architecture': arch,
+        'input_shape': list(net.input_shape[1:]),
+        'batch_size': batch_size,
+        'layers': layers,
+        'total': {
+            'params': net.count_params(),
+            'flops': sum(l['flops'] for l in layers),
+            'activation_bytes': sum(l['activation_bytes'] for l in layers),
+            'latency_ms': sum(l['latency_ms'] for l in layers),
+            'forward_ms': forward['latency_ms'],
+        },
+        'throughput': throughput,
+    }
+
+
+def print_report(report):
+    print('Architecture: {}, input shape: {}, batch size: {}'
+          .format(report['architecture'], tuple(report['input_shape']), report['batch_size']))
+
+    row = '{:<24} {:<18} {:<18} {:>10} {:>14} {:>12} {:>12} {:>12}'
+    print(row.format('Layer', 'Type', 'Output', 'Params', 'FLOPs', 'Act. KiB', 'Latency ms', 'Overhead ms'))
+    for l in report['layers']:
+        print(row.format(l['name'], l['type'], str(tuple(l['output_shape'])), l['params'], l['flops'],
+                         '{:.1f}'.format(l['activation_bytes'] / 1024), '{:.3f}'.format(l['latency_ms']),
+                         '{:.3f}'.format(l['overhead_ms'])))
+
+    total = report['total']
+    print(row.format('Total', '', '', total['params'], total['flops'],
+                     '{:.1f}'.format(total['activation_bytes'] / 1024), '{:.3f}'.format(total['latency_ms']), ''))
+    print('Layer latency has the per-call overhead subtracted, end-to-end forward pass: {:.3f} ms'
+          .format(total['forward_ms']))
+
+    print()
+    row = '{:>10} {:>12} {:>14}'
+    print(row.format('Batch', 'Latency ms', 'Samples/s'))
+    for t in report['throughput']:
+        print(row.format(t['batch_size'], '{:.3f}'.format(t['latency_ms']), '{:.1f}'.format(t['samples_per_s'])))
+
+
+def print_comparison(a, b):
+    row = '{:<24} {:>18} {:>18} {:>10}'
+    print(row.format('', a['architecture'], b['architecture'], 'Ratio'))
+
+    def line(label, x, y, fmt='{}'):
+        ratio = '{:.2f}'.format(y / x) if x else '-'
+        print(row.format(label, fmt.format(x), fmt.format(y), ratio))
+
+    for key, label, fmt in [('params', 'Params', '{}'),
+                            ('flops', 'FLOPs', '{}'),
+                            ('activation_bytes', 'Activations KiB', '{:.1f}'),
+                            ('forward_ms', 'Forward ms', '{:.3f}')]:
+        x, y = a['total'][key], b['total'][key]
+        if key == 'activation_bytes':
+            x, y = x / 1024, y / 1024
+        line(label, x, y, fmt)
+
+    b_throughput = {t['batch_size']: t for t in b['throughput']}
+    for t in a['throughput']:
+        other = b_throughput.get(t['batch_size'])
+        if other:
+            line('Samples/s @ {}'.format(t['batch_size']), t['samples_per_s'], other['samples_per_s'], '{:.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Model profiler')
+
+    parser.add_argument('arch', type=str, help='architecture name ({}) or saved model file'
+                        .format(', '.join(sorted(ARCHITECTURES))))
+    parser.add_argument('--compare', type=str, required=False, default=None, help='second architecture to compare with')
+    parser.add_argument('--shape', type=int, nargs=3, required=False, default=None,
+                        help='input shape H W C, default {} or the shape of a saved model'.format(DEFAULT_SHAPE))
+    parser.add_argument('--batch', type=int, required=False, default=1, help='batch size for per-layer profiling')
+    parser.add_argument('--batches', type=int, nargs='+', required=False, default=[1, 8, 32, 128],
+                        help='batch sizes for throughput')
+    parser.add_argument('--repeats', type=int, required=False, default=20, help='timed runs per measurement')
+    parser.add_argument('--warmup', type=int, required=False, default=3, help='untimed runs per measurement')
+    parser.add_argument('--json', type=str, required=False, default=None, help='filename to save JSON report to')
+
+    args = parser.parse_args()
+
+    shape = tuple(args.shape) if args.shape else None
+    archs = [args.arch] + ([args.compare] if args.compare else [])
+
+    reports = []
+    for arch in archs:
+        try:
+            net = build(arch, shape)
+        except ValueError as e:
+            sys.exit('Cannot profile {}: {}'.format(arch, e))
+
+        report = profile(arch, net, args.batch, args.batches, args.repeats, args.warmup)
+
+        print_report(report)
+        print()
+        reports.append(report)
+
+    if len(reports) == 2:
+        print_comparison(*reports)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump({'reports': reports}, json_file, indent=2)